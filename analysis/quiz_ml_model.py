@@ -20,17 +20,27 @@ with open('analysis/quiz_attempts_data.json', 'w') as f:
     json.dump(data.data, f, indent=2)
 print(f'Exported {len(data.data)} records')
 "
+
+Once trained, both models are exported to ONNX (requires skl2onnx). To re-score
+the current data with the saved models instead of retraining (requires onnxruntime):
+    python analysis/quiz_ml_model.py --score-only
 """
 
+import argparse
 import json
 import numpy as np
 from pathlib import Path
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score, classification_report, confusion_matrix, roc_auc_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
 
+try:
+    import orjson  # faster parsing of large Supabase exports
+except ImportError:
+    orjson = None
+
+# sklearn (and the scipy/joblib stack behind it) is imported inside the functions
+# that need it, so early exits like "not enough data" or --help stay fast.
+
+LOGREG_ONNX_PATH = Path(__file__).parent / 'quiz_logreg.onnx'
+GB_ONNX_PATH = Path(__file__).parent / 'quiz_gb.onnx'
 
 def load_quiz_attempts():
     """Load quiz attempts from local JSON file."""
@@ -42,62 +52,11 @@ def load_quiz_attempts():
             "Run the export command in the module docstring to fetch fresh data from Supabase."
         )
     
+    if orjson is not None:
+        return orjson.loads(data_path.read_bytes())
     with open(data_path) as f:
         return json.load(f)
 
-def extract_features(attempt):
-    """Extract numerical features from a quiz attempt."""
-    ctx = attempt.get('context', {}) or {}
-    concept = ctx.get('conceptKnowledge', {}) or {}
-    user_avg = ctx.get('userAverages', {}) or {}
-    distractors = ctx.get('distractors', []) or []
-    
-    # Core knowledge features
-    answer_knowledge = concept.get('answerModality', 50)
-    question_knowledge = concept.get('questionModality', 50)
-    overall_knowledge = concept.get('overall', 50)
-    
-    # User averages
-    user_char = user_avg.get('character', 60)
-    user_pinyin = user_avg.get('pinyin', 60)
-    user_meaning = user_avg.get('meaning', 60)
-    user_audio = user_avg.get('audio', 60)
-    user_avg_all = (user_char + user_pinyin + user_meaning + user_audio) / 4
-    
-    # Distractor features
-    dist_knowledge = [d.get('knowledge', 50) for d in distractors]
-    dist_avg = np.mean(dist_knowledge) if dist_knowledge else 50
-    dist_max = max(dist_knowledge) if dist_knowledge else 50
-    
-    # Knowledge gap (target vs distractors)
-    knowledge_gap = answer_knowledge - dist_avg
-    
-    # Days since last attempt (0 if None)
-    days_since = ctx.get('daysSinceLastAttempt')
-    days_since = days_since if days_since is not None else 0
-    
-    # Predicted correct (system's baseline prediction)
-    predicted = ctx.get('predictedCorrect', 50)
-    
-    # Modality encoding
-    modality_map = {'character': 0, 'pinyin': 1, 'meaning': 2, 'audio': 3}
-    q_mod = modality_map.get(attempt.get('question_modality', 'character'), 0)
-    a_mod = modality_map.get(attempt.get('answer_modality', 'character'), 0)
-    
-    return [
-        answer_knowledge,
-        question_knowledge,
-        overall_knowledge,
-        user_avg_all,
-        dist_avg,
-        dist_max,
-        knowledge_gap,
-        days_since,
-        predicted,
-        q_mod,
-        a_mod,
-    ]
-
 FEATURE_NAMES = [
     'answer_knowledge',
     'question_knowledge', 
@@ -112,7 +71,202 @@ FEATURE_NAMES = [
     'answer_modality',
 ]
 
+# Modality encoding: names are compared in full and unknown names map to 0
+_MODALITIES = ('character', 'pinyin', 'meaning', 'audio')
+
+def _modality_codes(names):
+    """Map modality names to their index in _MODALITIES (unknown names map to 0)."""
+    names = np.asarray(names, dtype=str)
+    codes = np.zeros(len(names), dtype=np.int8)
+    # One vectorized full-name comparison per modality; 'character' is already 0
+    for code, name in enumerate(_MODALITIES[1:], start=1):
+        codes[names == name] = code
+    return codes
+
+def build_feature_matrix(data):
+    """Build the (N, 11) feature matrix and label vector for all quiz attempts.
+    
+    Features are float32 (all small knowledge/modality scores) and labels int8,
+    which halves the memory traffic through the scaler and model fits.
+    """
+    n = len(data)
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    y = np.empty(n, dtype=np.int8)
+    
+    # Distractor knowledge per row, padded out to the widest distractor set
+    max_dist = max((len((a.get('context') or {}).get('distractors') or []) for a in data), default=0)
+    dist_buf = np.zeros((n, max(max_dist, 1)), dtype=np.float32)
+    dist_len = np.zeros(n, dtype=np.int32)
+    
+    q_mods = []
+    a_mods = []
+    
+    for i, attempt in enumerate(data):
+        ctx = attempt.get('context', {}) or {}
+        concept = ctx.get('conceptKnowledge', {}) or {}
+        user_avg = ctx.get('userAverages', {}) or {}
+        distractors = ctx.get('distractors', []) or []
+        
+        # Core knowledge features
+        X[i, 0] = concept.get('answerModality', 50)
+        X[i, 1] = concept.get('questionModality', 50)
+        X[i, 2] = concept.get('overall', 50)
+        
+        # User averages
+        X[i, 3] = (
+            user_avg.get('character', 60)
+            + user_avg.get('pinyin', 60)
+            + user_avg.get('meaning', 60)
+            + user_avg.get('audio', 60)
+        ) / 4
+        
+        # Distractor knowledge (aggregated after the loop)
+        for j, d in enumerate(distractors):
+            dist_buf[i, j] = d.get('knowledge', 50)
+        dist_len[i] = len(distractors)
+        
+        # Days since last attempt (0 if None)
+        days_since = ctx.get('daysSinceLastAttempt')
+        X[i, 7] = days_since if days_since is not None else 0
+        
+        # Predicted correct (system's baseline prediction)
+        X[i, 8] = ctx.get('predictedCorrect', 50)
+        
+        q_mods.append(attempt.get('question_modality', 'character') or 'character')
+        a_mods.append(attempt.get('answer_modality', 'character') or 'character')
+        
+        y[i] = 1 if attempt['correct'] else 0
+    
+    # Distractor features (50 when an attempt has no distractors)
+    has_dist = dist_len > 0
+    padded = np.arange(dist_buf.shape[1]) >= dist_len[:, None]
+    dist_top = np.where(padded, -np.inf, dist_buf).max(axis=1)
+    # Keep the division in float32 (int32 counts would promote it to float64)
+    X[:, 4] = np.where(has_dist, dist_buf.sum(axis=1) / np.maximum(dist_len, 1, dtype=np.float32), 50)
+    X[:, 5] = np.where(has_dist, dist_top, 50)
+    
+    # Knowledge gap (target vs distractors)
+    X[:, 6] = X[:, 0] - X[:, 4]
+    
+    X[:, 9] = _modality_codes(q_mods)
+    X[:, 10] = _modality_codes(a_mods)
+    
+    return X, y
+
+def _export_error_path(path):
+    """Where a failed export leaves its reason, so --score-only can report it."""
+    return path.with_name(path.name + '.error')
+
+def _convert_hist_gb(scope, operator, container):
+    """skl2onnx's HistGradientBoosting converter, with its tree flags cast to int.
+    
+    skl2onnx puts a Python bool in nodes_missing_value_tracks_true for every
+    leaf, which recent onnx releases reject in an INTS attribute.
+    """
+    from skl2onnx.operator_converters.random_forest import convert_sklearn_random_forest_classifier
+    
+    add_node = container.add_node
+    def add_node_int_flags(*args, **attrs):
+        if 'nodes_missing_value_tracks_true' in attrs:
+            attrs['nodes_missing_value_tracks_true'] = [int(v) for v in attrs['nodes_missing_value_tracks_true']]
+        return add_node(*args, **attrs)
+    
+    container.add_node = add_node_int_flags
+    try:
+        convert_sklearn_random_forest_classifier(scope, operator, container)
+    finally:
+        del container.add_node
+
+def export_onnx(estimator, X_sample, path):
+    """Save a fitted model (or pipeline) as ONNX so it can be scored without retraining."""
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.pipeline import Pipeline
+    try:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+    except ImportError:
+        print(f"skl2onnx not installed, skipping ONNX export of {path.name}")
+        return
+    
+    error_path = _export_error_path(path)
+    # Emit probabilities as a plain tensor rather than a list of dicts
+    final_step = estimator.steps[-1][1] if isinstance(estimator, Pipeline) else estimator
+    try:
+        onx = convert_sklearn(
+            estimator,
+            initial_types=[('X', FloatTensorType([None, X_sample.shape[1]]))],
+            options={id(final_step): {'zipmap': False}},
+            custom_conversion_functions={HistGradientBoostingClassifier: _convert_hist_gb},
+        )
+    except Exception as e:
+        # Converter coverage varies across skl2onnx/onnx versions; don't lose the analysis over it.
+        # The message can embed every tree attribute, so keep its first line and the cause.
+        reason = f"{type(e).__name__}: {str(e).splitlines()[0][:300]}"
+        if e.__cause__ is not None:
+            reason += f" (caused by {type(e.__cause__).__name__}: {e.__cause__})"
+        print(f"ONNX export of {path.name} failed, skipping: {reason}")
+        # Don't leave a stale model from an earlier run to be scored as this one
+        path.unlink(missing_ok=True)
+        error_path.write_text(reason + "\n", encoding='utf-8')
+        return
+    path.write_bytes(onx.SerializeToString())
+    error_path.unlink(missing_ok=True)
+    print(f"Saved ONNX model: {path.name}")
+
+def predict_proba_onnx(path, X):
+    """Score features with a saved ONNX model, returning P(correct)."""
+    import onnxruntime
+    
+    sess = onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    # The exported graphs are typed for float32 input
+    _, proba = sess.run(None, {sess.get_inputs()[0].name: np.asarray(X, dtype=np.float32)})
+    return proba[:, 1]
+
+def score_saved_models(X, y):
+    """Score all attempts with the exported ONNX models instead of retraining.
+    
+    This re-scores every row, including the ones the models were trained on,
+    so the metrics are optimistic and not comparable to the held-out results.
+    """
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+    try:
+        import onnxruntime  # checked up front; predict_proba_onnx imports it per model
+    except ImportError:
+        print("onnxruntime not installed, can't score the saved models. Install it with:")
+        print("  pip install onnxruntime")
+        return
+    
+    for label, path in [("Logistic Regression", LOGREG_ONNX_PATH), ("Gradient Boosting", GB_ONNX_PATH)]:
+        print(f"\n{'='*60}")
+        print(f"SCORING SAVED MODEL ({label})")
+        print("All rows, including training rows (not a held-out score)")
+        print(f"{'='*60}")
+        
+        error_path = _export_error_path(path)
+        if error_path.exists():
+            print(f"The {label} model could not be exported to ONNX on the last training run, "
+                  f"so there is nothing to score:\n  {error_path.read_text(encoding='utf-8').strip()}")
+            continue
+        if not path.exists():
+            print(f"Model not found: {path}\nRun without --score-only first to train and export it.")
+            continue
+        
+        y_proba = predict_proba_onnx(path, X)
+        y_pred = (y_proba >= 0.5).astype(np.int8)
+        try:
+            auc = roc_auc_score(y, y_proba)
+        except:
+            auc = 0.5
+        print(f"Accuracy:  {accuracy_score(y, y_pred):.3f}")
+        print(f"F1 Score:  {f1_score(y, y_pred, zero_division=0):.3f}")
+        print(f"ROC-AUC:   {auc:.3f}")
+
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--score-only', action='store_true',
+                        help="score the data with the saved ONNX models instead of retraining")
+    args = parser.parse_args()
+    
     print(f"\n{'='*60}")
     print("QUIZ ML MODEL - Predicting Correctness from Context Features")
     print(f"{'='*60}")
@@ -130,18 +284,24 @@ def main():
         return
     
     # Extract features and labels
-    X = []
-    y = []
-    for attempt in data:
-        features = extract_features(attempt)
-        X.append(features)
-        y.append(1 if attempt['correct'] else 0)
+    X, y = build_feature_matrix(data)
+    
+    # Count via NumPy: Python's sum() would overflow on int8 labels
+    n_correct = int(np.count_nonzero(y))
+    print(f"Correct: {n_correct} ({100*n_correct/len(y):.1f}%)")
+    print(f"Incorrect: {len(y)-n_correct} ({100*(len(y)-n_correct)/len(y):.1f}%)")
     
-    X = np.array(X)
-    y = np.array(y)
+    if args.score_only:
+        score_saved_models(X, y)
+        return
     
-    print(f"Correct: {sum(y)} ({100*sum(y)/len(y):.1f}%)")
-    print(f"Incorrect: {len(y)-sum(y)} ({100*(len(y)-sum(y))/len(y):.1f}%)")
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score, classification_report, confusion_matrix, roc_auc_score
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.inspection import permutation_importance
+    from sklearn.pipeline import Pipeline
     
     # Train/test split (80/20)
     X_train, X_test, y_train, y_test = train_test_split(
@@ -151,7 +311,7 @@ def main():
     print(f"\nTrain set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
     
-    # Scale features
+    # Scale features (only the linear model needs it)
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
@@ -160,16 +320,21 @@ def main():
     model = LogisticRegression(random_state=42, max_iter=1000, class_weight='balanced')
     model.fit(X_train_scaled, y_train)
     
-    # Also train Random Forest for comparison
-    rf_model = RandomForestClassifier(random_state=42, n_estimators=100, class_weight='balanced')
-    rf_model.fit(X_train_scaled, y_train)
+    # Also train histogram gradient boosting for comparison (smaller and faster to predict than a forest).
+    # Tree splits are scale-invariant, so it trains on the raw features.
+    gb_model = HistGradientBoostingClassifier(max_iter=100, learning_rate=0.1, class_weight='balanced', random_state=42)
+    gb_model.fit(X_train, y_train)
+    
+    # Export so both saved models take raw features (scaler baked into the linear one)
+    export_onnx(Pipeline([('scaler', scaler), ('model', model)]), X_train, LOGREG_ONNX_PATH)
+    export_onnx(gb_model, X_train, GB_ONNX_PATH)
     
     # Predictions
     y_pred = model.predict(X_test_scaled)
     y_proba = model.predict_proba(X_test_scaled)[:, 1]
     
-    y_pred_rf = rf_model.predict(X_test_scaled)
-    y_proba_rf = rf_model.predict_proba(X_test_scaled)[:, 1]
+    y_pred_gb = gb_model.predict(X_test)
+    y_proba_gb = gb_model.predict_proba(X_test)[:, 1]
     
     # Metrics
     print(f"\n{'='*60}")
@@ -207,19 +372,19 @@ def main():
     print(f"{'-'*40}")
     print(classification_report(y_test, y_pred, target_names=['Incorrect', 'Correct']))
     
-    # Random Forest results
+    # Gradient boosting results
     print(f"\n{'='*60}")
-    print("RANDOM FOREST COMPARISON")
+    print("GRADIENT BOOSTING COMPARISON")
     print(f"{'='*60}")
-    rf_acc = accuracy_score(y_test, y_pred_rf)
-    rf_f1 = f1_score(y_test, y_pred_rf, zero_division=0)
+    gb_acc = accuracy_score(y_test, y_pred_gb)
+    gb_f1 = f1_score(y_test, y_pred_gb, zero_division=0)
     try:
-        rf_auc = roc_auc_score(y_test, y_proba_rf)
+        gb_auc = roc_auc_score(y_test, y_proba_gb)
     except:
-        rf_auc = 0.5
-    print(f"Accuracy:  {rf_acc:.3f}")
-    print(f"F1 Score:  {rf_f1:.3f}")
-    print(f"ROC-AUC:   {rf_auc:.3f}")
+        gb_auc = 0.5
+    print(f"Accuracy:  {gb_acc:.3f}")
+    print(f"F1 Score:  {gb_f1:.3f}")
+    print(f"ROC-AUC:   {gb_auc:.3f}")
     
     # Feature importance
     print(f"\n{'='*60}")
@@ -228,20 +393,23 @@ def main():
     
     print("\nLogistic Regression Coefficients:")
     coefs = model.coef_[0]
-    importance = sorted(zip(FEATURE_NAMES, coefs), key=lambda x: abs(x[1]), reverse=True)
     
-    for name, coef in importance:
+    for i in np.argsort(-np.abs(coefs), kind='stable'):
+        coef = coefs[i]
         direction = "+" if coef > 0 else "-"
-        print(f"  {direction} {name:20s}: {coef:+.3f}")
+        print(f"  {direction} {FEATURE_NAMES[i]:20s}: {coef:+.3f}")
     
-    print("\nRandom Forest Feature Importance:")
-    rf_importance = sorted(zip(FEATURE_NAMES, rf_model.feature_importances_), key=lambda x: x[1], reverse=True)
-    for name, imp in rf_importance:
+    # Histogram GBT has no impurity importances, so measure on the held-out set instead
+    print("\nGradient Boosting Permutation Importance:")
+    gb_importances = permutation_importance(gb_model, X_test, y_test, n_repeats=10, random_state=42).importances_mean
+    for i in np.argsort(-gb_importances, kind='stable'):
+        imp = gb_importances[i]
         bar = "█" * int(imp * 30)
-        print(f"  {name:20s}: {imp:.3f} {bar}")
+        print(f"  {FEATURE_NAMES[i]:20s}: {imp:.3f} {bar}")
     
     # Baseline comparison
-    majority_baseline = max(sum(y_test), len(y_test) - sum(y_test)) / len(y_test)
+    n_test_correct = int(np.count_nonzero(y_test))
+    majority_baseline = max(n_test_correct, len(y_test) - n_test_correct) / len(y_test)
     print(f"\n{'='*60}")
     print("BASELINE COMPARISON")
     print(f"{'='*60}")
@@ -254,14 +422,16 @@ def main():
     print("CALIBRATION CHECK")
     print(f"{'='*60}")
     
-    bins = [(0, 0.3), (0.3, 0.5), (0.5, 0.7), (0.7, 0.85), (0.85, 1.0)]
-    for low, high in bins:
-        mask = (y_proba >= low) & (y_proba < high)
-        if mask.sum() > 0:
-            actual_rate = y_test[mask].mean()
-            predicted_rate = y_proba[mask].mean()
-            print(f"  P({low:.1f}-{high:.1f}): {mask.sum():2d} samples, "
-                  f"predicted={predicted_rate:.2f}, actual={actual_rate:.2f}")
+    # Bin every prediction once, then aggregate all bins with bincount
+    edges = np.array([0.0, 0.3, 0.5, 0.7, 0.85, 1.0])
+    n_bins = len(edges) - 1
+    idx = np.clip(np.digitize(y_proba, edges) - 1, 0, n_bins - 1)
+    counts = np.bincount(idx, minlength=n_bins)
+    actual_rate = np.bincount(idx, weights=y_test, minlength=n_bins) / np.maximum(counts, 1)
+    predicted_rate = np.bincount(idx, weights=y_proba, minlength=n_bins) / np.maximum(counts, 1)
+    for b in np.flatnonzero(counts):
+        print(f"  P({edges[b]:.1f}-{edges[b + 1]:.1f}): {counts[b]:2d} samples, "
+              f"predicted={predicted_rate[b]:.2f}, actual={actual_rate[b]:.2f}")
 
 if __name__ == "__main__":
     main()
@@ -7,6 +7,7 @@ across all chapters, accounting for OCR errors.
 
 import os
 import sys
+import importlib.util
 from pathlib import Path
 
 # Load .env from repo root
@@ -22,13 +23,27 @@ def load_env():
 
 load_env()
 
-try:
-    import anthropic
-except ImportError:
+# Install anthropic only if it is genuinely missing (checked without importing it)
+if importlib.util.find_spec("anthropic") is None:
     print("Installing anthropic package...")
     import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "anthropic", "-q"])
-    import anthropic
+    pip_cmd = [sys.executable, "-m", "pip", "install", "--quiet", "--no-input", "--disable-pip-version-check", "anthropic"]
+    try:
+        subprocess.check_call(pip_cmd, stdout=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        # No write access to site-packages: fall back to a per-user install
+        # (which pip refuses inside a virtualenv)
+        import site
+        try:
+            subprocess.check_call(pip_cmd + ["--user"], stdout=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            print("Error: could not install anthropic automatically. Install it with:")
+            print(f"  {sys.executable} -m pip install anthropic")
+            sys.exit(1)
+        site.addsitedir(site.getusersitepackages())
+    importlib.invalidate_caches()
+
+import anthropic
 
 
 def read_hsk1_content():
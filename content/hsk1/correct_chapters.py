@@ -6,11 +6,15 @@ Uses the structure analysis to guide corrections.
 
 import os
 import sys
+import importlib.util
+import io
 import re
 import json
+import mmap
+import asyncio
+from functools import lru_cache
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 
 # Load .env from repo root
 def load_env():
@@ -25,17 +29,45 @@ def load_env():
 
 load_env()
 
-try:
-    import anthropic
-except ImportError:
+# Install anthropic only if it is genuinely missing (checked without importing it)
+if importlib.util.find_spec("anthropic") is None:
     print("Installing anthropic package...")
     import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "anthropic", "-q"])
-    import anthropic
+    pip_cmd = [sys.executable, "-m", "pip", "install", "--quiet", "--no-input", "--disable-pip-version-check", "anthropic"]
+    try:
+        subprocess.check_call(pip_cmd, stdout=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        # No write access to site-packages: fall back to a per-user install
+        # (which pip refuses inside a virtualenv)
+        import site
+        try:
+            subprocess.check_call(pip_cmd + ["--user"], stdout=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            print("Error: could not install anthropic automatically. Install it with:")
+            print(f"  {sys.executable} -m pip install anthropic")
+            sys.exit(1)
+        site.addsitedir(site.getusersitepackages())
+    importlib.invalidate_caches()
 
+import anthropic
 
+# Shared async client: concurrent chapter requests reuse one connection pool (keep-alive), not one client each
+_CLIENT = anthropic.AsyncAnthropic(max_retries=2, timeout=anthropic.Timeout(600.0, connect=5.0))
+
+# Page separators written by ocr_extract.py ("="*60, "## PAGE N", "="*60),
+# and audio markers like "01-1", "02-3"
+_PAGE_TAG = b'\n## PAGE '
+_RULE_MIN = 60
+_LESSON_RE = re.compile(r'(\d{2})-\d+')
+
+# Chinese numerals for chapter headers, indexed by lesson number
+_INT_TO_CN = ('零', '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
+              '十一', '十二', '十三', '十四', '十五')
+
+
+@lru_cache(maxsize=1)
 def read_structure_analysis() -> str:
-    """Read the structure analysis for context."""
+    """Read the structure analysis for context (cached after the first read)."""
     script_dir = Path(__file__).parent
     analysis_path = script_dir / "chapter_structure_analysis.txt"
     if analysis_path.exists():
@@ -44,64 +76,110 @@ def read_structure_analysis() -> str:
     return ""
 
 
+def iter_page_markers(buf) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) offsets of each page separator block in buf.
+    
+    Finds the fixed "## PAGE " tag with a plain substring search and then
+    checks the surrounding "=" rules, which is much cheaper than a regex
+    scan with a variable-length prefix over the whole file.
+    """
+    pos = 0
+    while True:
+        tag = buf.find(_PAGE_TAG, pos)
+        if tag < 0:
+            return
+        
+        # At least _RULE_MIN '=' immediately before the tag (back to the previous marker at most)
+        line_start = max(buf.rfind(b'\n', pos, tag) + 1, pos)
+        before = buf[line_start:tag]
+        rule_before = len(before) - len(before.rstrip(b'='))
+        
+        # Page number, then a newline and at least _RULE_MIN '=' after it
+        num_start = tag + len(_PAGE_TAG)
+        num_end = buf.find(b'\n', num_start)
+        if num_end < 0:
+            return
+        after_end = buf.find(b'\n', num_end + 1)
+        after = buf[num_end + 1:after_end if after_end >= 0 else len(buf)]
+        rule_after = len(after) - len(after.lstrip(b'='))
+        
+        if rule_before >= _RULE_MIN and rule_after >= _RULE_MIN and buf[num_start:num_end].isdigit():
+            end = num_end + 1 + rule_after
+            yield tag - rule_before, end
+            pos = end
+        else:
+            pos = tag + 1
+
+
+def iter_ocr_pages(ocr_path: Path) -> Iterator[str]:
+    """Yield page texts from the OCR file, memory-mapped rather than read whole."""
+    with open(ocr_path, 'rb') as f:
+        # mmap can't map an empty file, and an empty file has no pages
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Text mode used to turn \r\n and lone \r into \n; only a file that
+            # actually has \r pays for a normalized copy
+            buf = mm if mm.find(b'\r') < 0 else mm[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            prev_end = 0
+            for start, end in iter_page_markers(buf):
+                page_text = buf[prev_end:start].decode('utf-8')
+                # Skip the file header before the first page marker
+                if prev_end > 0 or not page_text.startswith('#'):
+                    yield page_text
+                prev_end = end
+            page_text = buf[prev_end:].decode('utf-8')
+            if prev_end > 0 or not page_text.startswith('#'):
+                yield page_text
+
+
 def extract_chapters_from_ocr() -> Dict[int, str]:
     """Extract individual chapters from the OCR file."""
     script_dir = Path(__file__).parent
     ocr_path = script_dir / "hsk1_ocr.txt"
     
-    with open(ocr_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split by page markers
-    pages = re.split(r'={60,}\n## PAGE \d+\n={60,}', content)
-    if pages and pages[0].startswith('#'):
-        pages = pages[1:]
-    
-    # Group pages into chapters based on audio markers (01-X, 02-X, etc.)
-    chapters = {}
+    # Group pages into chapters based on audio markers (01-X, 02-X, etc.),
+    # streaming each page straight into its chapter's buffer
+    chapters_buf: Dict[int, io.StringIO] = {}
     current_lesson = 0
-    current_content = []
+    current_buf = None
     
-    for page_text in pages:
+    for page_text in iter_ocr_pages(ocr_path):
+        page_text = page_text.strip()
+        
         # Find lesson number from audio markers like "01-1", "02-3"
-        match = re.search(r'(\d{2})-\d+', page_text)
-        if match:
-            lesson_num = int(match.group(1))
-            if lesson_num <= 15 and lesson_num != current_lesson:
-                if current_content and current_lesson > 0:
-                    chapters[current_lesson] = '\n\n'.join(current_content)
-                current_lesson = lesson_num
-                current_content = [page_text.strip()]
+        match = _LESSON_RE.search(page_text)
+        lesson_num = int(match.group(1)) if match else None
+        if lesson_num is not None and lesson_num <= 15 and lesson_num != current_lesson:
+            current_lesson = lesson_num
+            if current_lesson:
+                current_buf = chapters_buf[current_lesson] = io.StringIO()
+                current_buf.write(page_text)
             else:
-                if page_text.strip():
-                    current_content.append(page_text.strip())
-        else:
-            if page_text.strip():
-                current_content.append(page_text.strip())
-    
-    if current_content and current_lesson > 0:
-        chapters[current_lesson] = '\n\n'.join(current_content)
+                # A lesson-0 match (e.g. "10:00-12:00") ends the chapter but starts none
+                current_buf = None
+        elif page_text and current_buf is not None:
+            # Pages before the first lesson marker (or after a lesson-0 one) have no chapter and are dropped
+            current_buf.write('\n\n')
+            current_buf.write(page_text)
     
-    return chapters
+    return {num: buf.getvalue() for num, buf in chapters_buf.items()}
 
 
-def correct_chapter_with_claude(chapter_num: int, chapter_content: str, structure_context: str) -> Tuple[int, str]:
-    """Use Claude to correct a single chapter."""
-    
-    client = anthropic.Anthropic()
-    
-    chinese_nums = ['零', '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
-                   '十一', '十二', '十三', '十四', '十五']
-    
-    prompt = f"""You are correcting Chapter {chapter_num} (第{chinese_nums[chapter_num]}课) of an HSK 1 Chinese textbook.
+# Chapter-independent part of the correction prompt; {structure_context} is the
+# same for every chapter in a run. It is sent as its own content block marked for
+# prompt caching (~2k tokens filled in, above the 1024-token minimum). The cache
+# entry exists only once a request has been processed, so the first wave of
+# concurrent requests each write it and the chapters started after them read it.
+CORRECTION_RUBRIC = """You are correcting one chapter of an HSK 1 Chinese textbook.
 
 The content was extracted via OCR and contains errors that need fixing.
 
 ## STRUCTURE CONTEXT (from analysis of full book):
-{structure_context[:4000]}
+{structure_context}
 
 ## YOUR TASK:
-Correct the OCR errors and reformat this chapter into clean, well-structured text.
+Correct the OCR errors and reformat the chapter into clean, well-structured text.
 
 ### CORRECTION RULES:
 
@@ -128,9 +206,16 @@ Correct the OCR errors and reformat this chapter into clean, well-structured tex
 5. 练习 Exercises  
 6. 拼音 Pinyin
 7. 汉字 Characters
-8. 运用 Application
+8. 运用 Application"""
+
 
-## CHAPTER {chapter_num} RAW OCR CONTENT:
+async def correct_chapter_with_claude(chapter_num: int, chapter_content: str, rubric: str) -> Tuple[int, str]:
+    """Use Claude to correct a single chapter.
+    
+    rubric is CORRECTION_RUBRIC already filled in for this run, shared by every chapter.
+    """
+    
+    chapter_prompt = f"""## CHAPTER {chapter_num} (第{_INT_TO_CN[chapter_num]}课) RAW OCR CONTENT:
 ---
 {chapter_content}
 ---
@@ -139,72 +224,76 @@ Please output the CORRECTED chapter in clean, readable format.
 Preserve all educational content but fix OCR errors and improve formatting.
 Start directly with the chapter header."""
 
-    response = client.messages.create(
+    response = await _CLIENT.messages.create(
         model="claude-sonnet-4-20250514",
         max_tokens=8000,
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": [
+                {"type": "text", "text": rubric, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": chapter_prompt},
+            ]}
         ]
     )
     
     return chapter_num, response.content[0].text
 
 
-def process_all_chapters_parallel(chapters: Dict[int, str], structure_context: str, max_workers: int = 5):
-    """Process all chapters in parallel."""
+async def process_all_chapters_parallel(chapters: Dict[int, str], structure_context: str, max_workers: int = 5):
+    """Process all chapters concurrently on a single event loop."""
     script_dir = Path(__file__).parent
     output_dir = script_dir / "corrected_chapters"
     output_dir.mkdir(exist_ok=True)
     
     results = {}
+    semaphore = asyncio.Semaphore(max_workers)
     
-    print(f"\nProcessing {len(chapters)} chapters with {max_workers} parallel workers...")
+    # Built once and closed over, so every request sends a byte-identical cached prefix
+    rubric = CORRECTION_RUBRIC.format(structure_context=structure_context[:4000])
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all chapter correction tasks
-        future_to_chapter = {
-            executor.submit(correct_chapter_with_claude, num, content, structure_context): num
-            for num, content in chapters.items()
-        }
-        
-        # Collect results as they complete
-        for future in as_completed(future_to_chapter):
-            chapter_num = future_to_chapter[future]
-            try:
-                num, corrected_content = future.result()
-                results[num] = corrected_content
-                
-                # Save immediately
-                output_path = output_dir / f"chapter_{num:02d}.txt"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(corrected_content)
-                
-                print(f"  ✓ Chapter {num} completed ({len(corrected_content)} chars) → {output_path.name}")
-                
-            except Exception as e:
-                print(f"  ✗ Chapter {chapter_num} failed: {e}")
+    print(f"\nProcessing {len(chapters)} chapters with {max_workers} concurrent requests...")
+    
+    async def correct_one(chapter_num: int, content: str):
+        try:
+            async with semaphore:
+                num, corrected_content = await correct_chapter_with_claude(chapter_num, content, rubric)
+            results[num] = corrected_content
+            
+            # Save immediately, off the event loop
+            output_path = output_dir / f"chapter_{num:02d}.txt"
+            await asyncio.to_thread(output_path.write_text, corrected_content, encoding='utf-8')
+            
+            print(f"  ✓ Chapter {num} completed ({len(corrected_content)} chars) → {output_path.name}")
+            
+        except Exception as e:
+            print(f"  ✗ Chapter {chapter_num} failed: {e}")
+    
+    await asyncio.gather(*(correct_one(num, content) for num, content in chapters.items()))
     
     return results
 
 
-def combine_all_chapters(output_dir: Path):
-    """Combine all corrected chapters into one file."""
-    combined_path = output_dir.parent / "hsk1_corrected.txt"
+def combine_all_chapters(output_dir: Path, results: Dict[int, str]):
+    """Combine all corrected chapters into one file.
     
-    all_content = ["# HSK 1 - Chapters 1-15 (Corrected)\n"]
-    all_content.append("# OCR errors fixed, formatting standardized\n\n")
-    
-    for i in range(1, 16):
-        chapter_path = output_dir / f"chapter_{i:02d}.txt"
-        if chapter_path.exists():
-            with open(chapter_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            all_content.append("\n" + "=" * 70 + "\n")
-            all_content.append(content)
-            all_content.append("\n")
+    Chapters corrected in this run are taken from `results`; any others fall
+    back to the chapter files left on disk by earlier runs.
+    """
+    combined_path = output_dir.parent / "hsk1_corrected.txt"
     
-    with open(combined_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(all_content))
+    with open(combined_path, 'w', encoding='utf-8') as out:
+        out.write("# HSK 1 - Chapters 1-15 (Corrected)\n")
+        out.write("\n# OCR errors fixed, formatting standardized\n\n")
+        
+        for i in range(1, 16):
+            content = results.get(i)
+            if content is None:
+                chapter_path = output_dir / f"chapter_{i:02d}.txt"
+                if not chapter_path.exists():
+                    continue
+                content = chapter_path.read_text(encoding='utf-8')
+            out.write("\n\n" + "=" * 70 + "\n\n")
+            out.write(content)
+            out.write("\n\n")
     
     print(f"\nCombined all chapters → {combined_path}")
     return combined_path
@@ -226,12 +315,12 @@ def main():
     for num in sorted(chapters.keys()):
         print(f"  - Chapter {num}: {len(chapters[num])} chars")
     
-    # Process all chapters in parallel
-    results = process_all_chapters_parallel(chapters, structure_context, max_workers=5)
+    # Process all chapters concurrently
+    results = asyncio.run(process_all_chapters_parallel(chapters, structure_context, max_workers=5))
     
     # Combine into single file
     output_dir = script_dir / "corrected_chapters"
-    combine_all_chapters(output_dir)
+    combine_all_chapters(output_dir, results)
     
     print("\n" + "=" * 60)
     print("CORRECTION COMPLETE")
@@ -12,9 +12,11 @@ These are mutually exclusive from 'hsk' (New Words) vocabulary.
 
 import os
 import sys
+import importlib.util
 import json
+import asyncio
+from functools import lru_cache
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Any
 
 # Load .env from repo root
@@ -38,28 +40,54 @@ def load_env():
 
 load_env()
 
-try:
-    import anthropic
-except ImportError:
+# Install anthropic only if it is genuinely missing (checked without importing it)
+if importlib.util.find_spec("anthropic") is None:
     print("Installing anthropic package...")
     import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "anthropic", "-q"])
-    import anthropic
+    pip_cmd = [sys.executable, "-m", "pip", "install", "--quiet", "--no-input", "--disable-pip-version-check", "anthropic"]
+    try:
+        subprocess.check_call(pip_cmd, stdout=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        # No write access to site-packages: fall back to a per-user install
+        # (which pip refuses inside a virtualenv)
+        import site
+        try:
+            subprocess.check_call(pip_cmd + ["--user"], stdout=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            print("Error: could not install anthropic automatically. Install it with:")
+            print(f"  {sys.executable} -m pip install anthropic")
+            sys.exit(1)
+        site.addsitedir(site.getusersitepackages())
+    importlib.invalidate_caches()
 
+import anthropic
 
-def load_existing_hsk_words() -> set:
-    """Load existing HSK vocabulary words to avoid duplicates."""
+try:
+    import orjson  # optional: faster JSON load/dump
+except ImportError:
+    orjson = None
+
+# Shared async client: concurrent chapter requests reuse one connection pool (keep-alive), not one client each
+_CLIENT = anthropic.AsyncAnthropic(max_retries=2, timeout=anthropic.Timeout(600.0, connect=5.0))
+
+
+@lru_cache(maxsize=1)
+def load_existing_hsk_words() -> frozenset:
+    """Load existing HSK vocabulary words to avoid duplicates (cached, so immutable)."""
     script_dir = Path(__file__).parent
     vocab_path = script_dir / "hsk1_vocabulary.json"
     
     if not vocab_path.exists():
         print(f"Warning: {vocab_path} not found. Run extract_vocabulary.py first.")
-        return set()
+        return frozenset()
     
-    with open(vocab_path, 'r', encoding='utf-8') as f:
-        vocab = json.load(f)
+    if orjson is not None:
+        vocab = orjson.loads(vocab_path.read_bytes())
+    else:
+        with open(vocab_path, 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
     
-    return {entry['word'] for entry in vocab}
+    return frozenset(entry['word'] for entry in vocab)
 
 
 def read_chapter(chapter_num: int) -> str:
@@ -74,17 +102,11 @@ def read_chapter(chapter_num: int) -> str:
         return f.read()
 
 
-def extract_atoms_with_claude(chapter_num: int, chapter_content: str, existing_hsk_words: set) -> List[Dict[str, Any]]:
-    """Use Claude to extract atom vocabulary from a chapter."""
-    
-    if not chapter_content.strip():
-        return []
-    
-    client = anthropic.Anthropic()
-    
-    existing_list = ", ".join(sorted(existing_hsk_words)[:100])  # Show first 100 for context
-    
-    prompt = f"""Analyze Chapter {chapter_num} of an HSK1 Chinese textbook and extract "atom" vocabulary.
+# Chapter-independent part of the atom prompt, sent as its own content block;
+# {existing_list} is the same word sample for every chapter in a run. Filled in
+# it is under 1k tokens, below the minimum cacheable prompt length, so it is not
+# marked for prompt caching.
+ATOM_RUBRIC = """You will analyze one chapter of an HSK1 Chinese textbook and extract "atom" vocabulary.
 
 ## WHAT ARE ATOMS?
 
@@ -110,11 +132,6 @@ Atoms are SIMPLE terms that appear in the chapter but are NOT in the official "N
 ## EXISTING HSK WORDS (DO NOT INCLUDE THESE):
 {existing_list}... (showing first 100)
 
-## CHAPTER {chapter_num} CONTENT:
----
-{chapter_content}
----
-
 ## OUTPUT FORMAT:
 
 Return a JSON array of atom vocabulary. Each entry should have:
@@ -130,16 +147,35 @@ Example output:
   {{"word": "四", "pinyin": "sì", "part_of_speech": "numeral", "meaning": "four", "context": "number table in notes section"}},
   {{"word": "五", "pinyin": "wǔ", "part_of_speech": "numeral", "meaning": "five", "context": "number table in notes section"}}
 ]
-```
+```"""
+
 
+async def extract_atoms_with_claude(chapter_num: int, chapter_content: str, rubric: str) -> List[Dict[str, Any]]:
+    """Use Claude to extract atom vocabulary from a chapter.
+    
+    rubric is ATOM_RUBRIC already filled in with the existing-words sample for this run.
+    """
+    
+    if not chapter_content.strip():
+        return []
+    
+    chapter_prompt = f"""## CHAPTER {chapter_num} CONTENT:
+---
+{chapter_content}
+---
+
+Extract the atoms from Chapter {chapter_num} above.
 Return ONLY the JSON array, no other text. If no atoms are found, return an empty array: []"""
 
     try:
-        response = client.messages.create(
+        response = await _CLIENT.messages.create(
             model="claude-opus-4-20260201",
             max_tokens=4000,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": [
+                    {"type": "text", "text": rubric},
+                    {"type": "text", "text": chapter_prompt},
+                ]}
             ]
         )
         
@@ -169,14 +205,16 @@ Return ONLY the JSON array, no other text. If no atoms are found, return an empt
         return []
 
 
-def process_all_chapters(max_workers: int = 5) -> List[Dict[str, Any]]:
-    """Process all chapters in parallel to extract atoms."""
+async def process_all_chapters(max_workers: int = 5) -> List[Dict[str, Any]]:
+    """Process all chapters concurrently to extract atoms."""
     
     existing_hsk_words = load_existing_hsk_words()
     print(f"Loaded {len(existing_hsk_words)} existing HSK words to exclude")
     
-    all_atoms = []
-    seen_words = set(existing_hsk_words)  # Start with HSK words to prevent duplicates
+    # Same sample for every chapter prompt, so sort, join and format it once;
+    # the chapter coroutines close over the finished rubric
+    existing_list = ", ".join(sorted(existing_hsk_words)[:100])  # Show first 100 for context
+    rubric = ATOM_RUBRIC.format(existing_list=existing_list)
     
     # Read all chapters
     chapters = {}
@@ -185,33 +223,39 @@ def process_all_chapters(max_workers: int = 5) -> List[Dict[str, Any]]:
         if content:
             chapters[i] = content
     
-    print(f"\nProcessing {len(chapters)} chapters with {max_workers} parallel workers...")
+    print(f"\nProcessing {len(chapters)} chapters with {max_workers} concurrent requests...")
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_chapter = {
-            executor.submit(extract_atoms_with_claude, num, content, existing_hsk_words): num
-            for num, content in chapters.items()
-        }
-        
-        chapter_results = {}
-        for future in as_completed(future_to_chapter):
-            chapter_num = future_to_chapter[future]
-            try:
-                atoms = future.result()
-                chapter_results[chapter_num] = atoms
-                print(f"  ✓ Chapter {chapter_num}: found {len(atoms)} atoms")
-            except Exception as e:
-                print(f"  ✗ Chapter {chapter_num} failed: {e}")
-                chapter_results[chapter_num] = []
+    semaphore = asyncio.Semaphore(max_workers)
     
-    # Combine results in chapter order, deduplicating
+    async def extract_one(chapter_num: int, content: str):
+        try:
+            async with semaphore:
+                atoms = await extract_atoms_with_claude(chapter_num, content, rubric)
+            print(f"  ✓ Chapter {chapter_num}: found {len(atoms)} atoms")
+        except Exception as e:
+            print(f"  ✗ Chapter {chapter_num} failed: {e}")
+            atoms = []
+        return chapter_num, atoms
+    
+    chapter_results = {}
+    for next_done in asyncio.as_completed([extract_one(num, content) for num, content in chapters.items()]):
+        chapter_num, atoms = await next_done
+        chapter_results[chapter_num] = atoms
+    
+    # Combine results in chapter order: the earliest chapter wins for each word,
+    # regardless of which request finished first
+    merged = {}
+    total = 0
     for chapter_num in sorted(chapter_results.keys()):
         for atom in chapter_results[chapter_num]:
-            if atom['word'] not in seen_words:
-                all_atoms.append(atom)
-                seen_words.add(atom['word'])
-            else:
-                print(f"    Skipping duplicate: {atom['word']} (ch.{chapter_num})")
+            merged.setdefault(atom['word'], atom)
+            total += 1
+    
+    # Drop anything already covered by the HSK New Words list
+    all_atoms = [atom for word, atom in merged.items() if word not in existing_hsk_words]
+    
+    if total > len(all_atoms):
+        print(f"    Skipped {total - len(all_atoms)} duplicate atoms")
     
     return all_atoms
 
@@ -231,7 +275,7 @@ def main():
         print("Run correct_chapters.py first.")
         return
     
-    atoms = process_all_chapters(max_workers=5)
+    atoms = asyncio.run(process_all_chapters(max_workers=5))
     
     # Sort by chapter, then by word
     atoms.sort(key=lambda x: (x['chapter'], x['word']))
@@ -252,8 +296,12 @@ def main():
     print(f"\nTotal unique atoms: {len(atoms)}")
     
     # Save to JSON
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(atoms, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        # orjson always emits UTF-8, matching ensure_ascii=False
+        output_path.write_bytes(orjson.dumps(atoms, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(atoms, f, ensure_ascii=False, indent=2)
     
     print(f"\nSaved to: {output_path}")
     
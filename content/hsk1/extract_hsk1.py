@@ -8,96 +8,101 @@ import re
 import sys
 from pathlib import Path
 
-def extract_pdf_text(pdf_path):
-    """Extract all text from PDF."""
+# Common patterns for lesson/chapter markers in Chinese textbooks, as one regex.
+# Anchoring at line start with a lazy `.*?` before each branch makes the engine
+# try the branches in this priority order, exactly like searching each pattern
+# in turn, but in a single call. The named group that matched says which it was.
+# MULTILINE lets `^` anchor at every line start of the full text; gaps use
+# [^\S\n]* rather than \s* so a marker never spans a line break.
+_CHAPTER_RE = re.compile(
+    r'^(?:'
+    r'.*?第[^\S\n]*(?P<d>\d+)[^\S\n]*课'                      # 第1课, 第 1 课
+    r'|.*?第[^\S\n]*(?P<c>[一二三四五六七八九十]+)[^\S\n]*课'  # 第一课
+    r'|.*?Lesson[^\S\n]*(?P<l>\d+)'                           # Lesson 1
+    r'|.*?L(?P<ls>\d+)'                                       # L1
+    r'|.*?Unit[^\S\n]*(?P<u>\d+)'                             # Unit 1
+    r')',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Chinese numerals used in lesson headers, 1-15
+_INT_TO_CN = ('零', '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
+              '十一', '十二', '十三', '十四', '十五')
+_CN_TO_INT = {cn: num for num, cn in enumerate(_INT_TO_CN) if num}
+
+_CHAPTER_NUM_RE = re.compile(r'(\d+)')
+
+# Section rules for the structured output, newline included
+_RULE = "=" * 60 + "\n"
+_HASH_RULE = "#" * 60 + "\n"
+
+def extract_pdf_text(pdf_path, out):
+    """Extract all text from PDF, writing it page by page to the text stream `out`."""
     doc = fitz.open(pdf_path)
-    full_text = []
     
     for page_num, page in enumerate(doc):
-        text = page.get_text()
-        full_text.append(f"--- PAGE {page_num + 1} ---\n{text}")
+        if page_num:
+            out.write('\n')
+        out.write('--- PAGE ')
+        out.write(str(page_num + 1))
+        out.write(' ---\n')
+        # Default flags on purpose: flags=0 or a reused TextPage was no faster
+        # here, and would change ligature, whitespace and clipping output
+        out.write(page.get_text())
     
     doc.close()
-    return "\n".join(full_text)
 
 def structure_into_chapters(text):
     """
     Try to structure the text into chapters.
     HSK textbooks typically have lessons marked as 第X课 or Lesson X.
     """
-    # Common patterns for lesson/chapter markers in Chinese textbooks
-    patterns = [
-        r'第\s*(\d+)\s*课',           # 第1课, 第 1 课
-        r'第\s*([一二三四五六七八九十]+)\s*课',  # 第一课
-        r'Lesson\s*(\d+)',            # Lesson 1
-        r'L(\d+)',                    # L1
-        r'Unit\s*(\d+)',              # Unit 1
-    ]
-    
-    # Try to find chapter markers
+    # One scan over the whole text: with MULTILINE, `^` anchors at every line
+    # start, so each match starts at the first character of a marker line.
+    # A chapter runs from its marker line up to (not including) the newline
+    # before the next one, exactly as if the lines had been split and rejoined.
     chapters = {}
-    current_chapter = "Introduction"
-    current_content = []
-    
-    lines = text.split('\n')
-    
-    for line in lines:
-        found_chapter = False
-        for pattern in patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                # Save previous chapter
-                if current_content:
-                    chapters[current_chapter] = '\n'.join(current_content)
-                
-                # Start new chapter
-                chapter_num = match.group(1)
-                # Convert Chinese numbers if needed
-                chinese_nums = {'一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-                              '六': '6', '七': '7', '八': '8', '九': '9', '十': '10',
-                              '十一': '11', '十二': '12', '十三': '13', '十四': '14', '十五': '15'}
-                chapter_num = chinese_nums.get(chapter_num, chapter_num)
-                current_chapter = f"Chapter {chapter_num}"
-                current_content = [line]
-                found_chapter = True
-                break
-        
-        if not found_chapter:
-            current_content.append(line)
-    
-    # Save last chapter
-    if current_content:
-        chapters[current_chapter] = '\n'.join(current_content)
+    matches = list(_CHAPTER_RE.finditer(text))
+    
+    if not matches:
+        chapters["Introduction"] = text
+        return chapters
+    
+    if matches[0].start():
+        chapters["Introduction"] = text[:matches[0].start() - 1]
+    
+    ends = [m.start() - 1 for m in matches[1:]]
+    ends.append(len(text))
+    for match, end in zip(matches, ends):
+        chapter_num = match[match.lastgroup]
+        # Convert Chinese numbers if needed
+        if match.lastgroup == 'c':
+            chapter_num = _CN_TO_INT.get(chapter_num, chapter_num)
+        chapters[f"Chapter {chapter_num}"] = text[match.start():end]
     
     return chapters
 
-def format_output(chapters):
-    """Format chapters into a structured text file."""
-    output = []
-    output.append("=" * 60)
-    output.append("HSK 1 - Chapters 1-15")
-    output.append("Extracted from HSK1_SC_L1-L15.pdf")
-    output.append("=" * 60)
-    output.append("")
+def format_output(chapters, out):
+    """Write chapters as a structured text file to the text stream `out`.
+    
+    Returns the number of characters written.
+    """
+    written = out.write(_RULE + "HSK 1 - Chapters 1-15\n"
+                        "Extracted from HSK1_SC_L1-L15.pdf\n" + _RULE)
     
     # Sort chapters properly
     def chapter_sort_key(ch):
         if ch == "Introduction":
             return 0
-        match = re.search(r'(\d+)', ch)
+        match = _CHAPTER_NUM_RE.search(ch)
         return int(match.group(1)) if match else 999
     
     for chapter in sorted(chapters.keys(), key=chapter_sort_key):
-        content = chapters[chapter]
-        output.append("")
-        output.append("#" * 60)
-        output.append(f"# {chapter}")
-        output.append("#" * 60)
-        output.append("")
-        output.append(content)
-        output.append("")
-    
-    return '\n'.join(output)
+        written += out.write(f"\n\n{_HASH_RULE}# {chapter}\n{_HASH_RULE}\n")
+        written += out.write(chapters[chapter])
+        written += out.write("\n")
+    
+    return written
 
 def main():
     script_dir = Path(__file__).parent
@@ -109,28 +114,29 @@ def main():
         sys.exit(1)
     
     print(f"Extracting text from: {pdf_path}")
-    raw_text = extract_pdf_text(pdf_path)
     
-    # First, let's save the raw text to see what we're working with
+    # First, let's save the raw text to see what we're working with.
+    # Pages stream straight to disk, so the text is only held in memory once
+    # (read back below) rather than as a page list plus its joined copy.
     raw_output = script_dir / "hsk1_raw.txt"
     with open(raw_output, 'w', encoding='utf-8') as f:
-        f.write(raw_text)
+        extract_pdf_text(pdf_path, f)
     print(f"Raw text saved to: {raw_output}")
     
     print("Structuring into chapters...")
+    with open(raw_output, 'r', encoding='utf-8', newline='') as f:
+        raw_text = f.read()
     chapters = structure_into_chapters(raw_text)
     
     print(f"Found {len(chapters)} sections:")
     for ch in chapters.keys():
         print(f"  - {ch}")
     
-    formatted = format_output(chapters)
-    
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(formatted)
+        total_chars = format_output(chapters, f)
     
     print(f"\nStructured content saved to: {output_path}")
-    print(f"Total characters: {len(formatted)}")
+    print(f"Total characters: {total_chars}")
 
 if __name__ == "__main__":
     main()
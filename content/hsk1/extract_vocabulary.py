@@ -5,9 +5,16 @@ Extract vocabulary from corrected HSK1 chapters and output as JSON for import.
 
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+try:
+    import orjson  # optional: faster JSON dump
+except ImportError:
+    orjson = None
+
 # Part of speech mapping from HSK format to LangSeed format
 POS_MAPPING = {
     'pron.': 'pronoun',
@@ -35,7 +42,22 @@ POS_MAPPING = {
     'interj': 'interjection',
 }
 
+# Vocabulary line patterns (compiled once; parse_vocab_line runs per line)
+_PINYIN_CHARS = 'a-zA-Züǖǘǚǜāáǎàēéěèīíǐìōóǒòūúǔù'
+_PY = rf'[{_PINYIN_CHARS}]+(?:\s+[{_PINYIN_CHARS}]+)?'  # one or two pinyin words
+_POS = r'(?:pron|adj|v|n|adv|prep|conj|part|num|m|mw|interj)\.?'
+
+_VOCAB_PIPE_HEAD_RE = re.compile(r'^(\d+)\.\s*(.+)$')
+# Space-separated line with or without a POS. The with-POS branch comes first
+# so every pinyin split is tried with a POS before falling back to none.
+_VOCAB_UNIFIED_RE = re.compile(
+    rf'^(\d+)\.\s*(\S+)\s+(?:({_PY})\s+({_POS})\s*(.+)|({_PY})\s+(.+))$',
+    re.IGNORECASE,
+)
+_VOCAB_LINE_DETECT_RE = re.compile(r'^\d+\.\s+\S')
+
 
+@lru_cache(maxsize=64)
 def normalize_pos(pos: str) -> str:
     """Normalize part of speech to LangSeed format."""
     pos_lower = pos.lower().strip()
@@ -55,7 +77,7 @@ def parse_vocab_line(line: str) -> Optional[Dict[str, Any]]:
         parts = line.split('|')
         if len(parts) >= 3:
             # Extract number and chinese from first part
-            first_match = re.match(r'^(\d+)\.\s*(.+)$', parts[0].strip())
+            first_match = _VOCAB_PIPE_HEAD_RE.match(parts[0].strip())
             if first_match:
                 num, chinese = first_match.groups()
                 pinyin = parts[1].strip()
@@ -77,12 +99,13 @@ def parse_vocab_line(line: str) -> Optional[Dict[str, Any]]:
                     }
     
     # Try space-separated format
-    # Pattern: number. chinese pinyin pos. meaning
-    pattern = r'^(\d+)\.\s*(\S+)\s+([a-zA-Züǖǘǚǜāáǎàēéěèīíǐìōóǒòūúǔù]+(?:\s+[a-zA-Züǖǘǚǜāáǎàēéěèīíǐìōóǒòūúǔù]+)?)\s+((?:pron|adj|v|n|adv|prep|conj|part|num|m|mw|interj)\.?)\s*(.+)$'
-    
-    match = re.match(pattern, line.strip(), re.IGNORECASE)
+    # Pattern: number. chinese pinyin [pos.] meaning
+    match = _VOCAB_UNIFIED_RE.match(line.strip())
     if match:
-        num, chinese, pinyin, pos, meaning = match.groups()
+        num, chinese, pinyin, pos, meaning, pinyin_only, meaning_only = match.groups()
+        if pos is None:
+            # Alternative pattern without explicit POS (some phrases)
+            pinyin, pos, meaning = pinyin_only, 'other', meaning_only
         return {
             'word': chinese.strip(),
             'pinyin': pinyin.strip(),
@@ -90,25 +113,6 @@ def parse_vocab_line(line: str) -> Optional[Dict[str, Any]]:
             'meaning': meaning.strip()
         }
     
-    # Try alternative pattern without explicit POS (some phrases)
-    pattern2 = r'^(\d+)\.\s*(\S+)\s+([a-zA-Züǖǘǚǜāáǎàēéěèīíǐìōóǒòūúǔù]+(?:\s+[a-zA-Züǖǘǚǜāáǎàēéěèīíǐìōóǒòūúǔù]+)?)\s+(.+)$'
-    match = re.match(pattern2, line.strip(), re.IGNORECASE)
-    if match:
-        num, chinese, pinyin, meaning = match.groups()
-        # Try to extract POS from meaning if present
-        pos_match = re.match(r'^((?:pron|adj|v|n|adv|prep|conj|part|num|m|mw|interj)\.?)\s*(.+)$', meaning, re.IGNORECASE)
-        if pos_match:
-            pos, meaning = pos_match.groups()
-        else:
-            pos = 'other'
-        
-        return {
-            'word': chinese.strip(),
-            'pinyin': pinyin.strip(),
-            'part_of_speech': normalize_pos(pos) if isinstance(pos, str) else 'other',
-            'meaning': meaning.strip()
-        }
-    
     return None
 
 
@@ -116,47 +120,48 @@ def extract_vocab_from_chapter(chapter_path: Path, chapter_num: int) -> List[Dic
     """Extract all vocabulary entries from a chapter file."""
     vocab = []
     
-    with open(chapter_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     # Find all lines that look like vocabulary entries (start with number followed by .)
-    lines = content.split('\n')
-    
-    for line in lines:
-        # Skip empty lines and headers
-        if not line.strip() or line.startswith('#') or line.startswith('|'):
-            continue
-        
-        # Check if this looks like a vocab line
-        if re.match(r'^\d+\.\s+\S', line):
-            entry = parse_vocab_line(line)
-            if entry:
-                entry['chapter'] = chapter_num
-                entry['source'] = 'hsk1'
-                vocab.append(entry)
+    # Lines are streamed from the file rather than read and split up front
+    with open(chapter_path, 'r', encoding='utf-8') as f:
+        for raw in f:
+            # Vocab lines start with their number, so anything else (empty lines,
+            # '#' headers, '|' table rows, indented text) is rejected before any regex
+            if not raw[:1].isdigit():
+                continue
+            
+            # Check if this looks like a vocab line
+            line = raw.rstrip('\n')
+            if _VOCAB_LINE_DETECT_RE.match(line):
+                entry = parse_vocab_line(line)
+                if entry:
+                    entry['chapter'] = chapter_num
+                    entry['source'] = 'hsk1'
+                    vocab.append(entry)
     
     return vocab
 
 
 def extract_all_chapters(chapters_dir: Path) -> List[Dict[str, Any]]:
     """Extract vocabulary from all chapter files."""
-    all_vocab = []
-    seen_words = set()  # Track duplicates
-    
+    tasks = []
     for i in range(1, 16):
         chapter_path = chapters_dir / f'chapter_{i:02d}.txt'
         if chapter_path.exists():
-            chapter_vocab = extract_vocab_from_chapter(chapter_path, i)
-            
+            tasks.append((chapter_path, i))
+    
+    # Chapters are read and parsed in parallel; map yields them back in
+    # chapter order, so dedup below still keeps the earliest chapter's entry
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        chapter_vocabs = executor.map(lambda task: extract_vocab_from_chapter(*task), tasks)
+        
+        vocab_by_word = {}  # insertion-ordered, so extraction order is kept
+        for (_, i), chapter_vocab in zip(tasks, chapter_vocabs):
             # Add only unique words (first occurrence wins)
             for entry in chapter_vocab:
-                if entry['word'] not in seen_words:
-                    all_vocab.append(entry)
-                    seen_words.add(entry['word'])
-                else:
+                if vocab_by_word.setdefault(entry['word'], entry) is not entry:
                     print(f"  Skipping duplicate: {entry['word']} (ch.{i})")
     
-    return all_vocab
+    return list(vocab_by_word.values())
 
 
 def main():
@@ -183,8 +188,12 @@ def main():
         print(f"  Chapter {ch}: {by_chapter[ch]} words")
     
     # Save as JSON
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(vocab, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        # orjson always emits UTF-8, matching ensure_ascii=False
+        output_path.write_bytes(orjson.dumps(vocab, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(vocab, f, ensure_ascii=False, indent=2)
     
     print(f"\nSaved to: {output_path}")
     
@@ -5,34 +5,41 @@ Extracts embedded images from PDF and runs OCR on them.
 """
 
 import fitz  # PyMuPDF
+import os
 import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 
-def ocr_image_macos(image_data):
-    """Use macOS Vision framework for OCR."""
+# Image formats Vision (ImageIO) decodes itself; extract_image bytes in these
+# are handed over as-is, anything else is decoded to pixels by PyMuPDF first
+PASSTHROUGH_EXTS = {"jpeg", "jpg", "png", "jpx", "tiff", "tif", "bmp", "gif"}
+
+# A request keeps its results on itself, so each OCR worker thread gets its own
+_vision_state = threading.local()
+
+def _text_request():
+    """Return this thread's text recognition request, configured once."""
+    request = getattr(_vision_state, 'request', None)
+    if request is None:
+        import Vision
+        
+        # Create text recognition request with Chinese support
+        request = Vision.VNRecognizeTextRequest.alloc().init()
+        request.setRecognitionLevel_(Vision.VNRequestTextRecognitionLevelAccurate)
+        request.setRecognitionLanguages_(["zh-Hans", "zh-Hant", "en"])  # Simplified Chinese, Traditional, English
+        request.setUsesLanguageCorrection_(True)
+        _vision_state.request = request
+    return request
+
+def _ocr_cg_image(cg_image):
+    """Run the text recognition request on a CGImage."""
     import Vision
-    import Quartz
-    from Foundation import NSData
-    
-    # Create CGImage from data
-    ns_data = NSData.dataWithBytes_length_(image_data, len(image_data))
-    image_source = Quartz.CGImageSourceCreateWithData(ns_data, None)
-    
-    if not image_source:
-        return ""
-    
-    cg_image = Quartz.CGImageSourceCreateImageAtIndex(image_source, 0, None)
-    if not cg_image:
-        return ""
     
     # Create request handler
     handler = Vision.VNImageRequestHandler.alloc().initWithCGImage_options_(cg_image, None)
     
-    # Create text recognition request with Chinese support
-    request = Vision.VNRecognizeTextRequest.alloc().init()
-    request.setRecognitionLevel_(Vision.VNRequestTextRecognitionLevelAccurate)
-    request.setRecognitionLanguages_(["zh-Hans", "zh-Hant", "en"])  # Simplified Chinese, Traditional, English
-    request.setUsesLanguageCorrection_(True)
+    request = _text_request()
     
     # Perform OCR
     success, error = handler.performRequests_error_([request], None)
@@ -51,41 +58,122 @@ def ocr_image_macos(image_data):
     
     return "\n".join(text_lines)
 
-def extract_pdf_with_ocr(pdf_path, output_path):
-    """Extract text from PDF by extracting embedded images and OCR-ing them."""
-    doc = fitz.open(pdf_path)
-    all_text = []
+def ocr_image_macos(image_data):
+    """Use macOS Vision framework for OCR."""
+    import Quartz
+    from Foundation import NSData
     
-    print(f"Processing {len(doc)} pages...")
+    # Create CGImage from data (wraps image_data without copying; it outlives
+    # every use of ns_data below)
+    ns_data = NSData.alloc().initWithBytesNoCopy_length_freeWhenDone_(image_data, len(image_data), False)
+    image_source = Quartz.CGImageSourceCreateWithData(ns_data, None)
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        images = page.get_images()
-        
-        print(f"  Page {page_num + 1}/{len(doc)}...", end=" ", flush=True)
-        
-        if not images:
-            print("(no images)")
-            continue
-        
-        page_text = []
-        for img_info in images:
-            xref = img_info[0]
-            base_image = doc.extract_image(xref)
-            img_data = base_image["image"]
+    if not image_source:
+        return ""
+    
+    cg_image = Quartz.CGImageSourceCreateImageAtIndex(image_source, 0, None)
+    if not cg_image:
+        return ""
+    
+    return _ocr_cg_image(cg_image)
+
+def ocr_pixels_macos(width, height, n, stride, samples):
+    """OCR a raw 8-bit gray (n=1) or RGB (n=3) pixel buffer without encoding it."""
+    import Quartz
+    from Foundation import NSData
+    
+    ns_data = NSData.alloc().initWithBytesNoCopy_length_freeWhenDone_(samples, len(samples), False)
+    provider = Quartz.CGDataProviderCreateWithCFData(ns_data)
+    if n == 1:
+        colorspace = Quartz.CGColorSpaceCreateDeviceGray()
+    else:
+        colorspace = Quartz.CGColorSpaceCreateDeviceRGB()
+    
+    cg_image = Quartz.CGImageCreate(
+        width, height, 8, 8 * n, stride, colorspace, Quartz.kCGImageAlphaNone,
+        provider, None, False, Quartz.kCGRenderingIntentDefault,
+    )
+    if not cg_image:
+        return ""
+    
+    return _ocr_cg_image(cg_image)
+
+def _page_image(doc, xref):
+    """Return an embedded image as encoded bytes, or as raw pixels if Vision can't decode its format."""
+    base_image = doc.extract_image(xref)
+    if base_image["ext"] in PASSTHROUGH_EXTS:
+        return base_image["image"]
+    
+    # Decode at the image's own resolution (no page render), reduced to the
+    # alpha-free gray/RGB layouts CGImageCreate takes
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return (pix.width, pix.height, pix.n, pix.stride, pix.samples)
+
+def _ocr_page(page_num, page_images):
+    """OCR one page's images; returns (page_num, text)."""
+    page_text = []
+    for img in page_images:
+        if isinstance(img, bytes):
+            text = ocr_image_macos(img)
+        else:
+            text = ocr_pixels_macos(*img)
+        if text.strip():
+            page_text.append(text)
+    return page_num, "\n".join(page_text)
+
+def extract_pdf_with_ocr(pdf_path, output_path):
+    """Extract text from PDF by extracting embedded images and OCR-ing them.
+    
+    Pages are OCR'd in parallel: Vision calls release the GIL, so a thread
+    per core keeps every core busy. PyMuPDF isn't thread-safe, so all
+    document access (image extraction) stays on the calling thread, which
+    reads ahead of the workers by at most 2 pages each.
+    """
+    doc = fitz.open(pdf_path)
+    n_pages = doc.page_count
+    page_texts = {}
+    
+    print(f"Processing {n_pages} pages...")
+    
+    def collect(done):
+        for future in done:
+            page_num, combined_text = future.result()
+            if combined_text:
+                page_texts[page_num] = combined_text
+                print(f"  Page {page_num + 1}/{n_pages}... ({len(combined_text)} chars)")
+            else:
+                print(f"  Page {page_num + 1}/{n_pages}... (empty)")
+    
+    n_workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # Keep only a couple of extracted pages per worker in flight, so memory
+        # stays flat however long the PDF is and extraction overlaps with OCR
+        pending = set()
+        for page_num, page in enumerate(doc):
+            images = page.get_images()
+            
+            if not images:
+                print(f"  Page {page_num + 1}/{n_pages}... (no images)")
+                continue
+            
+            if len(pending) >= 2 * n_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
             
-            # OCR the extracted image
-            text = ocr_image_macos(img_data)
-            if text.strip():
-                page_text.append(text)
+            page_images = [_page_image(doc, img_info[0]) for img_info in images]
+            pending.add(executor.submit(_ocr_page, page_num, page_images))
         
-        if page_text:
-            combined_text = "\n".join(page_text)
-            all_text.append(f"\n{'='*60}\n## PAGE {page_num + 1}\n{'='*60}\n")
-            all_text.append(combined_text)
-            print(f"({len(combined_text)} chars)")
-        else:
-            print("(empty)")
+        collect(as_completed(pending))
+    
+    # Reassemble in page order
+    all_text = []
+    for page_num in sorted(page_texts):
+        all_text.append(f"\n{'='*60}\n## PAGE {page_num + 1}\n{'='*60}\n")
+        all_text.append(page_texts[page_num])
     
     doc.close()
     
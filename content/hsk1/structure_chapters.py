@@ -4,16 +4,34 @@ Structure the OCR-extracted HSK1 content into proper chapters.
 Detects lesson boundaries from audio markers (01-X, 02-X, etc.)
 """
 
+import mmap
+import os
 import re
 from pathlib import Path
 
+# Chinese numerals for lesson headers, indexed by lesson number
+_INT_TO_CN = ('零', '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
+              '十一', '十二', '十三', '十四', '十五')
+
+_PAGE_SPLIT_RE = re.compile(rb'={60,}\n## PAGE \d+\n={60,}')
+_MARKER_RE = re.compile(r'(\d{2})-\d+')  # audio markers like "01-1", "02-3"
+
+# Lesson header rule for the structured output, newline included
+_RULE = "=" * 70 + "\n"
+
 def parse_ocr_output(input_path):
     """Parse the OCR output and split into pages."""
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split by page markers
-    pages = re.split(r'={60,}\n## PAGE \d+\n={60,}', content)
+    # Split the memory-mapped bytes by page markers and decode page by page,
+    # so the whole file is never held as one big string
+    with open(input_path, 'rb') as f:
+        # mmap can't map an empty file, and an empty file has no pages
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Text mode used to turn \r\n and lone \r into \n; only a file that
+            # actually has \r pays for a normalized copy
+            buf = mm if mm.find(b'\r') < 0 else mm[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            pages = [page.decode('utf-8') for page in _PAGE_SPLIT_RE.split(buf)]
     
     # Remove header
     if pages and pages[0].startswith('#'):
@@ -21,24 +39,9 @@ def parse_ocr_output(input_path):
     
     return pages
 
-def detect_lesson_start(text):
-    """Detect if this page starts a new lesson based on markers."""
-    # Look for lesson audio markers at the start like "01-1", "02-1" etc.
-    # These indicate the first audio track of a lesson
-    patterns = [
-        r'^[\s\S]{0,200}?(\d{2})-1\b',  # XX-1 near the start
-        r'课文\s*\nText',  # "课文 Text" header
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return True
-    return False
-
-def extract_lesson_number(text):
-    """Extract the lesson number from audio markers."""
-    match = re.search(r'(\d{2})-\d+', text)
+def _scan_page_marker(text):
+    """Return the lesson number of the first audio marker ("01-1", "02-3", ...) on a page, or None."""
+    match = _MARKER_RE.search(text)
     if match:
         return int(match.group(1))
     return None
@@ -50,7 +53,7 @@ def structure_into_chapters(pages):
     current_content = []
     
     for i, page_text in enumerate(pages):
-        lesson_num = extract_lesson_number(page_text)
+        lesson_num = _scan_page_marker(page_text)
         
         # Only accept lessons 1-15 (ignore OCR artifacts like "39")
         if lesson_num and lesson_num <= 15 and lesson_num != current_lesson:
@@ -72,28 +75,22 @@ def structure_into_chapters(pages):
     
     return chapters
 
-def format_output(chapters):
-    """Format chapters into structured output."""
-    output = []
-    output.append("# HSK 1 - Chapters 1-15")
-    output.append("# Extracted from HSK1_SC_L1-L15.pdf via OCR")
-    output.append("# Note: Review for OCR errors, especially in pinyin tones")
-    output.append("")
+def format_output(chapters, out):
+    """Write chapters as structured output to the text stream `out`.
+    
+    Returns the number of characters written.
+    """
+    written = out.write("# HSK 1 - Chapters 1-15\n"
+                        "# Extracted from HSK1_SC_L1-L15.pdf via OCR\n"
+                        "# Note: Review for OCR errors, especially in pinyin tones\n")
     
     for lesson_num in sorted(chapters.keys()):
-        content = chapters[lesson_num]
-        chinese_num = ['零', '一', '二', '三', '四', '五', '六', '七', '八', '九', '十',
-                      '十一', '十二', '十三', '十四', '十五'][lesson_num]
-        
-        output.append("")
-        output.append("=" * 70)
-        output.append(f"## 第{chinese_num}课 - Lesson {lesson_num}")
-        output.append("=" * 70)
-        output.append("")
-        output.append(content)
-        output.append("")
+        chinese_num = _INT_TO_CN[lesson_num]
+        written += out.write(f"\n\n{_RULE}## 第{chinese_num}课 - Lesson {lesson_num}\n{_RULE}\n")
+        written += out.write(chapters[lesson_num])
+        written += out.write("\n")
     
-    return '\n'.join(output)
+    return written
 
 def main():
     script_dir = Path(__file__).parent
@@ -116,13 +113,11 @@ def main():
     for num in sorted(chapters.keys()):
         print(f"  - Lesson {num}: {len(chapters[num])} chars")
     
-    formatted = format_output(chapters)
-    
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(formatted)
+        total_chars = format_output(chapters, f)
     
     print(f"\nStructured content saved to: {output_path}")
-    print(f"Total: {len(formatted)} characters")
+    print(f"Total: {total_chars} characters")
 
 if __name__ == "__main__":
     main()